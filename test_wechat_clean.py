@@ -0,0 +1,91 @@
+import wechat_clean
+from wechat_clean import wechat_html_to_markdown
+
+
+def _convert(tmp_path, html: str) -> str:
+    src = tmp_path / "in.html"
+    src.write_text(html, encoding="utf-8")
+    out = tmp_path / "out.md"
+    wechat_html_to_markdown(str(src), str(out))
+    return out.read_text(encoding="utf-8")
+
+
+def test_deeply_nested_page(tmp_path, monkeypatch):
+    # whole-tree path: libxml2 must not stop at its default nesting limit
+    monkeypatch.setattr(wechat_clean, "_stream_md", lambda src_path, out: None)
+    html = "<p>intro</p>" + "<section>" * 600 + "<p>deep</p>" + "</section>" * 600 + "<p>end</p>"
+    assert _convert(tmp_path, html) == "intro\n\ndeep\n\nend\n"
+
+
+def test_deeply_nested_page_streamed(tmp_path):
+    src = tmp_path / "in.html"
+    src.write_text(
+        '<div id="js_content"><p>intro</p>' + "<section>" * 600 + "<p>deep</p>" + "</section>" * 600
+        + "<p>end</p></div>",
+        encoding="utf-8",
+    )
+    out = []
+    assert wechat_clean._stream_md(src, out) == ""  # streamed, no fallback to the whole tree
+    assert "".join(out).split() == ["intro", "deep", "end"]
+
+
+def test_block_inside_bold_paragraph_is_a_heading(tmp_path):
+    html = '<div id="js_content"><p><strong><section>Heading here</section></strong></p><p>body</p></div>'
+    assert _convert(tmp_path, html) == "### Heading here\n\nbody\n"
+
+
+def test_link_and_image_text_stay_separate_pieces(tmp_path):
+    html = (
+        '<div id="js_content"><p><strong>foo<a href="http://x?t=1">bar</a>baz</strong></p>'
+        "<table><tr><td>a<a>b</a>c</td><td>a<img>b</td></tr></table></div>"
+    )
+    assert _convert(tmp_path, html) == "### foo bar baz\n\na b c\ta b\n"
+
+
+def test_blank_text_nodes_are_squashed(tmp_path):
+    html = '<div id="js_content">&amp;<strong>\n\n\n\n<code>x</code></strong><p>a<span>\t</span>b</p></div>'
+    assert _convert(tmp_path, html) == "&\nxa b\n"
+
+
+_PAGE = """<html><head><title>Head title</title><script>var a = 1;</script></head><body>
+<h1 class="rich_media_title" id="activity-name"> Article <i>title</i> </h1>
+<div id="js_content" class="rich_media_content">
+  intro text
+  <p><strong>Short bold line</strong></p>
+  <p>See <a href="https://mp.weixin.qq.com/s?x=1&amp;chksm=2">the docs</a> for details.<img src="a.png"></p>
+  <section><h2>Part 1</h2><p>Para <em>one</em> with <code>x`y</code></p></section>
+  <ul><li>first<ul><li>nested</li></ul></li><li>second</li></ul>
+  <ol><li>one</li><li>two</li></ol>
+  <blockquote><p>quoted</p><p>lines</p></blockquote>
+  <pre>  code
+block</pre>
+  <table><tr><th>k</th><th>v</th></tr><tr><td>a<a>b</a></td><td>c</td></tr></table>
+  <hr>tail text
+</div>
+<div id="js_pc_qr_code">scan me</div>
+</body></html>"""
+
+
+def test_streamed_output_matches_tree(tmp_path, monkeypatch):
+    tree_md = _convert(tmp_path, _PAGE)
+    assert tree_md.startswith("# Article title\n\nintro text\n### Short bold line\n\nSee the docs for details.")
+    monkeypatch.setattr(wechat_clean, "_STREAM_MIN_SIZE", 0)
+    streamed = []
+    stream_md = wechat_clean._stream_md
+    monkeypatch.setattr(wechat_clean, "_stream_md", lambda src_path, out: streamed.append(stream_md(src_path, out)) or streamed[-1])
+    assert _convert(tmp_path, _PAGE) == tree_md
+    assert streamed == ["Article title"]
+
+
+def test_stream_hands_over_the_tree_without_container(tmp_path):
+    src = tmp_path / "in.html"
+    src.write_text(_PAGE.replace('id="js_content" ', ""), encoding="utf-8")
+    root = wechat_clean._stream_md(src, [])
+    assert root.tag == "html"
+    assert wechat_clean._locate_lxml(root)[1].text_content().split()[:2] == ["intro", "text"]
+
+
+def test_title_not_repeated_when_first_line_ends_at_other_line_breaks(tmp_path):
+    for brk in ("&#13;", "&#x2028;"):
+        html = f'<h1 id="activity-name">T</h1><div id="js_content"><h1>T{brk}x</h1></div>'
+        assert _convert(tmp_path, html).count("# T") == 1
@@ -2,272 +2,604 @@ from __future__ import annotations
 
 import re
 from pathlib import Path
-from bs4 import BeautifulSoup, NavigableString, Comment
+import lxml.html
+from lxml import etree
 
 # -----------------------------
 # WeChat HTML -> Clean Markdown
 # -----------------------------
 # deps:
-#   pip install beautifulsoup4 lxml
+#   pip install lxml
 #
 # usage:
 #   wechat_html_to_markdown("input.html", "output.md")
 
-FONT_RE = re.compile(r"font-size\s*:\s*([0-9.]+)\s*(px|pt)", re.I)
+# blank runs (space/tab/nbsp/zero-width space): before/after a newline, 2+ long, or a lone nbsp/zwsp
+_WS_RE = re.compile(
+    r"(?<=\n)([ \t\u00a0\u200b]+)|([ \t\u00a0\u200b]+)(?=\n)|([ \t\u00a0\u200b]{2,}|[\u00a0\u200b])"
+)
 
+# 3+ newlines, collapsed to one blank line on output
+_BLANKS_RE = re.compile(r"\n{3,}")
 
-def _parse_font_px(style: str) -> float | None:
-    m = FONT_RE.search(style or "")
-    if not m:
-        return None
-    val = float(m.group(1))
-    unit = m.group(2).lower()
-    return val if unit == "px" else val * 4.0 / 3.0  # 1pt ~ 1.333px
+# inline code: escape backticks
+_CODE_ESC = str.maketrans({"`": r"\`"})
+
+# whitespace squashed in all-blank text nodes (outside <pre>)
+_ASCII_SPACES = " \t\n\r\f"
+
+# tag classes for the Markdown walk
+_DROP = frozenset({"script", "style", "noscript", "img", "figure", "video", "audio", "source", "iframe", "canvas", "svg"})
+_BOLD = frozenset({"strong", "b"})
+_EM = frozenset({"em", "i"})
+_HEAD = frozenset({"h1", "h2", "h3", "h4", "h5", "h6"})
+_CONT = frozenset({"article", "div", "section"})
+_LISTS = frozenset({"ul", "ol"})
+_INLINE_TAGS = _BOLD | _EM | _DROP | _LISTS | {"br", "code"}  # need more than their text in _inline_md
+
+# list item indentation by nesting level
+_INDENTS = tuple("  " * n for n in range(8))
+
+# paragraphs with longer text are never treated as headings
+_HEADING_MAX_LEN = 60
+
+# removed from the content before conversion, subtree included
+_NOISY_TAGS = frozenset({
+    "script", "style", "noscript", "iframe", "form", "input", "button", "textarea", "select", "option",
+    "img", "figure", "video", "audio", "source", "canvas", "svg",
+})
+
+# exported pages are UTF-8; don't let libxml2 guess (it falls back to Latin-1 without <meta charset>).
+# Comments and processing instructions are dropped while parsing; huge_tree lifts libxml2's
+# nesting limit (256), past which it silently stops parsing (pathological WeChat nesting).
+_HTML_PARSER = lxml.html.HTMLParser(
+    encoding="utf-8", remove_comments=True, remove_pis=True, huge_tree=True
+)
 
+# CSS `.cls` equivalents, compiled once
+_TITLE_CLASS_XPATH = etree.XPath(
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' rich_media_title ')]"
+)
+_CONTENT_CLASS_XPATH = etree.XPath(
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' rich_media_content ')]"
+)
+# the same class test as _TITLE_CLASS_XPATH, for a single class attribute
+_TITLE_CLASS_RE = re.compile(r"(?:^|[ \t\r\n])rich_media_title(?:[ \t\r\n]|$)")
 
-def _max_font_px(tag) -> float:
-    """Find max font-size in px among tag + common inline descendants (cheap heuristic)."""
-    mx = 0.0
-    for t in [tag] + tag.find_all(["span", "strong", "b", "em", "i", "font"], recursive=True):
-        style = t.get("style")
-        if style:
-            px = _parse_font_px(style)
-            if px:
-                mx = max(mx, px)
-                if mx >= 24:
-                    break
-    return mx
+# bytes fed to the pull parser at a time
+_STREAM_CHUNK = 1 << 16
+
+# smaller pages are parsed as a whole: the pull parser is slower, and only saves memory on large pages
+_STREAM_MIN_SIZE = 4 << 20
+
+
+def _ws_sub(m: re.Match) -> str:
+    if m.lastindex != 3:
+        return ""  # blanks touching a newline
+    run = m.group(3).replace("\u200b", "")
+    return " " if len(run) >= 2 else run.replace("\u00a0", " ")
 
 
 def _clean_text(s: str) -> str:
     """Normalize whitespace but keep newlines."""
-    s = s.replace("\u00a0", " ").replace("\u200b", "")
-    s = re.sub(r"[ \t]+\n", "\n", s)
-    s = re.sub(r"\n[ \t]+", "\n", s)
-    s = re.sub(r"[ \t]{2,}", " ", s)
-    return s
+    return _WS_RE.sub(_ws_sub, s)
 
 
-def _inline_md(node) -> str:
-    """Convert inline nodes to Markdown inline text (drops links/images/scripts)."""
-    if isinstance(node, Comment):
-        return ""
-    if isinstance(node, NavigableString):
-        return str(node)
+def _squash_blank(s: str) -> str:
+    """A text node of ASCII whitespace only becomes one newline (if it has one) or one space."""
+    if s.strip(_ASCII_SPACES):
+        return s
+    return "\n" if "\n" in s else " "
 
-    if not hasattr(node, "name") or node.name is None:
-        return ""
-    name = node.name.lower()
 
-    if name in {"script", "style", "noscript"}:
-        return ""
-    if name in {"img", "figure", "video", "audio", "source", "iframe", "canvas", "svg"}:
-        return ""
-    if name == "br":
-        return "\n"
-    if name == "a":
-        # keep only visible text, drop href to avoid leaking tracking params
-        return "".join(_inline_md(c) for c in node.children)
-    if name in {"strong", "b"}:
-        txt = "".join(_inline_md(c) for c in node.children).strip()
-        return f"**{txt}**" if txt else ""
-    if name in {"em", "i"}:
-        txt = "".join(_inline_md(c) for c in node.children).strip()
-        return f"*{txt}*" if txt else ""
-    if name == "code" and (not node.parent or (node.parent.name or "").lower() != "pre"):
-        txt = node.get_text().replace("`", r"\`")
-        return f"`{txt}`"
-
-    return "".join(_inline_md(c) for c in node.children)
-
-
-def _looks_like_heading(p_tag) -> tuple[bool, int]:
+def _text(node) -> str:
+    """Visible text of an element: stripped text pieces joined by single spaces."""
+    return " ".join(s for s in (t.strip() for t in node.itertext()) if s)
+
+
+def _inline_md(node, *, skip_lists: bool = False) -> tuple[str, str, int]:
     """
-    Conservative heuristic:
+    Convert an element's content to Markdown inline text (drops links/images/scripts)
+    in a single walk that also gathers the heading heuristic inputs.
+    Returns (markdown, plain, bold_len):
+    - plain: visible text, same as _text(node)
+    - bold_len: length of the text inside <strong>/<b> descendants
+    bold_len is only tracked while plain is within _HEADING_MAX_LEN
+    (longer text is never a heading); past that it comes back as 0.
+    skip_lists leaves out direct <ul>/<ol> children (but not their tails), for <li>.
+    Expects comments to be removed already (iterwalk does not report them).
+    """
+    if not len(node):
+        # text only (the common short paragraph / list item): no walk needed
+        text = node.text or ""
+        return text, text.strip(), 0
+
+    bufs = [[]]
+    plain = []
+    open_bold = []  # one [chars, pieces] per enclosing <strong>/<b>
+    bold_len = 0
+    plain_len = 0
+    track = True  # still gathering heading stats
+    depth = 0
+    code = None  # inline <code> being collected as raw text
+
+    walker = etree.iterwalk(node, events=("start", "end"))
+    for event, el in walker:
+        tag = el.tag
+        if event == "start":
+            depth += 1
+            if el is node or tag not in _INLINE_TAGS:
+                pass  # span, font, a, ...: only their text (links keep no href)
+            elif tag in _BOLD:
+                open_bold.append([0, 0])
+                if code is None:
+                    bufs.append([])
+            elif code is not None:
+                pass  # raw text inside inline code
+            elif tag in _DROP or (skip_lists and depth == 2 and tag in _LISTS):
+                walker.skip_subtree()
+                continue
+            elif tag == "br":
+                bufs[-1].append("\n")
+                walker.skip_subtree()
+                continue
+            elif tag == "code" and el.getparent().tag != "pre":
+                code = el
+                bufs.append([])
+            elif tag in _EM:
+                bufs.append([])
+            text = el.text
+        else:
+            depth -= 1
+            if el is node:
+                break
+            if tag not in _INLINE_TAGS:
+                pass
+            elif tag in _BOLD:
+                chars, pieces = open_bold.pop()
+                bold_len += chars + max(0, pieces - 1)
+                if code is None:
+                    txt = "".join(bufs.pop()).strip()
+                    bufs[-1].append(f"**{txt}**" if txt else "")
+            elif el is code:
+                code = None
+                txt = "".join(bufs.pop()).translate(_CODE_ESC)
+                bufs[-1].append(f"`{txt}`")
+            elif tag in _EM and code is None:
+                txt = "".join(bufs.pop()).strip()
+                bufs[-1].append(f"*{txt}*" if txt else "")
+            text = el.tail
+        if text:
+            bufs[-1].append(text)
+            piece = text.strip()
+            if piece:
+                if track:
+                    plain_len += len(piece) + (1 if plain else 0)
+                    track = plain_len <= _HEADING_MAX_LEN
+                    for acc in open_bold:
+                        acc[0] += len(piece)
+                        acc[1] += 1
+                plain.append(piece)
+
+    if not track:
+        return "".join(bufs[0]), " ".join(plain), 0
+    return "".join(bufs[0]), " ".join(plain), bold_len
+
+
+def _looks_like_heading(text_len: int, bold_len: int, max_px: float) -> tuple[bool, int]:
+    """
+    Conservative heuristic (inputs as gathered by _inline_md):
     - short text
     - mostly bold OR large font-size
     """
-    text = p_tag.get_text(" ", strip=True)
-    if not text or len(text) > 60:
+    if not text_len or text_len > _HEADING_MAX_LEN:
         return (False, 0)
 
-    bold_text = "".join(b.get_text(" ", strip=True) for b in p_tag.find_all(["strong", "b"]))
-    bold_ratio = len(bold_text) / max(1, len(text))
-    max_px = _max_font_px(p_tag)
+    bold_ratio = bold_len / max(1, text_len)
 
     if bold_ratio >= 0.85 or max_px >= 16:
         if max_px >= 22:
             return (True, 2)
         if max_px >= 18:
             return (True, 3)
-        if bold_ratio >= 0.95 and len(text) <= 30:
+        if bold_ratio >= 0.95 and text_len <= 30:
             return (True, 3)
-        if bold_ratio >= 0.85 and len(text) <= 20:
+        if bold_ratio >= 0.85 and text_len <= 20:
             return (True, 4)
 
     return (False, 0)
 
 
-def _li_to_md(li_tag, *, list_level: int, ordered: bool, index: int) -> str:
-    nested_lists = []
-    content_parts = []
-    for c in li_tag.children:
-        if hasattr(c, "name") and c.name and c.name.lower() in {"ul", "ol"}:
-            nested_lists.append(c)
-        else:
-            content_parts.append(c)
+# _to_md stack frames: (op, a, b)
+_BLOCK = 0  # visit element a as a block, list level b
+_ITEM = 1   # render <li> a; b = (list_level, ordered, index)
+_EMIT = 2   # append text a to the current buffer
+_CLOSE = 3  # pop the current buffer, append a(text, b) to the one below
 
-    text = _clean_text("".join(_inline_md(c) for c in content_parts)).strip()
-    if not text and not nested_lists:
-        return ""
 
-    indent = "  " * list_level
-    prefix = f"{index}. " if ordered else "- "
-    line = f"{indent}{prefix}{text}".rstrip() + "\n"
-
-    nested_md = ""
-    for nl in nested_lists:
-        nested_md += _to_md(nl, list_level=list_level + 1)
-    return line + nested_md
-
-
-def _to_md(node, *, list_level: int = 0) -> str:
-    """Convert block-ish nodes to Markdown."""
-    if isinstance(node, Comment):
+def _fin_quote(s: str, _) -> str:
+    inner = _clean_text(s).strip()
+    if not inner:
         return ""
-    if isinstance(node, NavigableString):
-        return str(node)
+    lines = [ln for ln in inner.splitlines() if ln.strip()]
+    return "\n".join([f"> {ln}" for ln in lines]) + "\n\n"
 
-    if not hasattr(node, "name") or node.name is None:
-        return ""
-    name = node.name.lower()
 
-    # hard drop
-    if name in {"script", "style", "noscript", "img", "figure", "video", "audio", "source", "iframe", "canvas", "svg"}:
-        return ""
+def _fin_list(s: str, _) -> str:
+    return s + ("\n" if s else "")
 
-    # containers
-    if name in {"article", "div", "section"}:
-        return "".join(_to_md(c, list_level=list_level) for c in node.children)
-
-    # headings
-    if name in {"h1", "h2", "h3", "h4", "h5", "h6"}:
-        level = int(name[1])
-        text = _clean_text("".join(_inline_md(c) for c in node.children)).strip()
-        return f"{'#' * level} {text}\n\n" if text else ""
-
-    # paragraph (with heading heuristic)
-    if name == "p":
-        text_plain = node.get_text(" ", strip=True)
-        if not text_plain:
-            return ""
-        is_h, lvl = _looks_like_heading(node)
-        if is_h:
-            return f"{'#' * lvl} {_clean_text(text_plain).strip()}\n\n"
-        text = _clean_text("".join(_inline_md(c) for c in node.children)).strip()
-        return f"{text}\n\n" if text else ""
-
-    # blockquote
-    if name == "blockquote":
-        inner = _clean_text("".join(_to_md(c, list_level=list_level) for c in node.children)).strip()
-        if not inner:
-            return ""
-        lines = [ln for ln in inner.splitlines() if ln.strip()]
-        return "\n".join([f"> {ln}" for ln in lines]) + "\n\n"
-
-    # lists
-    if name == "ul":
-        items = [
-            _li_to_md(li, list_level=list_level, ordered=False, index=1)
-            for li in node.find_all("li", recursive=False)
-        ]
-        return "".join(items) + ("\n" if any(items) else "")
-
-    if name == "ol":
-        items = []
-        for idx, li in enumerate(node.find_all("li", recursive=False), start=1):
-            items.append(_li_to_md(li, list_level=list_level, ordered=True, index=idx))
-        return "".join(items) + ("\n" if items else "")
-
-    # code block
-    if name == "pre":
-        code = node.get_text().rstrip("\n")
-        return f"```\n{code}\n```\n\n" if code.strip() else ""
-
-    # table (minimal: TSV lines)
-    if name == "table":
-        rows = []
-        for tr in node.find_all("tr"):
-            cells = [c.get_text(" ", strip=True) for c in tr.find_all(["th", "td"])]
-            if any(cells):
-                rows.append("\t".join(cells))
-        return ("\n".join(rows) + "\n\n") if rows else ""
-
-    if name == "hr":
-        return "\n---\n\n"
-
-    # default: recurse
-    return "".join(_to_md(c, list_level=list_level) for c in node.children)
 
+def _push_children(stack: list, node, list_level: int) -> None:
+    """Queue node's children (each followed by its tail) so they pop in document order."""
+    for c in node.iterchildren(reversed=True):
+        if c.tail:
+            stack.append((_EMIT, c.tail, None))
+        stack.append((_BLOCK, c, list_level))
 
-def wechat_html_to_markdown(src_html_path: str, out_md_path: str) -> None:
+
+def _to_md(root, out: list[str], *, list_level: int = 0) -> None:
     """
-    Convert a downloaded WeChat public-account HTML file into clean, structured Markdown.
-    - No images
-    - Drops link hrefs to avoid tracking parameters
-    - Preserves headings/paragraphs/lists/quotes/code/table (best-effort)
+    Convert block-ish nodes to Markdown, appending chunks to out.
+    Iterative walk: an explicit stack of frames instead of recursion; blocks whose
+    output is post-processed (quotes, lists) render into a nested buffer that a
+    _CLOSE frame folds back into its parent. Inline content goes through _inline_md.
     """
-    html = Path(src_html_path).read_text(encoding="utf-8", errors="ignore")
-
+    bufs = [out]
+    stack = [(_BLOCK, root, list_level)]
+    while stack:
+        op, node, arg = stack.pop()
+
+        if op == _EMIT:
+            bufs[-1].append(node)
+            continue
+        if op == _CLOSE:
+            s = "".join(bufs.pop())
+            bufs[-1].append(node(s, arg))
+            continue
+
+        if op == _ITEM:
+            level, ordered, index = arg
+            nested_lists = list(node.iterchildren(*_LISTS))
+            text = _clean_text(_inline_md(node, skip_lists=True)[0]).strip()
+            if not text and not nested_lists:
+                continue
+            indent = _INDENTS[level] if level < len(_INDENTS) else "  " * level
+            prefix = f"{index}. " if ordered else "- "
+            bufs[-1].append(f"{indent}{prefix}{text}".rstrip() + "\n")
+            for nl in reversed(nested_lists):
+                stack.append((_BLOCK, nl, level + 1))
+            continue
+
+        # comments / processing instructions carry a non-string tag
+        name = node.tag
+        if not isinstance(name, str):
+            continue
+
+        level = arg
+
+        # hard drop
+        if name in _DROP:
+            continue
+
+        # containers
+        if name in _CONT:
+            _push_children(stack, node, level)
+            if node.text:
+                bufs[-1].append(node.text)
+            continue
+
+        # headings
+        if name in _HEAD:
+            text = _clean_text(_inline_md(node)[0]).strip()
+            if text:
+                bufs[-1].append(f"{'#' * int(name[1])} {text}\n\n")
+            continue
+
+        # paragraph (with heading heuristic)
+        if name == "p":
+            md, text_plain, bold_len = _inline_md(node)
+            if not text_plain:
+                continue
+            # no font-size: _clean_content has already stripped the style attributes
+            is_h, lvl = _looks_like_heading(len(text_plain), bold_len, 0.0)
+            if is_h:
+                bufs[-1].append(f"{'#' * lvl} {_clean_text(text_plain).strip()}\n\n")
+                continue
+            text = _clean_text(md).strip()
+            if text:
+                bufs[-1].append(f"{text}\n\n")
+            continue
+
+        # blockquote
+        if name == "blockquote":
+            stack.append((_CLOSE, _fin_quote, None))
+            _push_children(stack, node, level)
+            bufs.append([node.text or ""])
+            continue
+
+        # lists
+        if name == "ul":
+            stack.append((_CLOSE, _fin_list, None))
+            for li in reversed(node.findall("li")):
+                stack.append((_ITEM, li, (level, False, 1)))
+            bufs.append([])
+            continue
+
+        if name == "ol":
+            items = node.findall("li")
+            if items:
+                stack.append((_EMIT, "\n", None))
+            for idx in range(len(items), 0, -1):
+                stack.append((_ITEM, items[idx - 1], (level, True, idx)))
+            continue
+
+        # code block
+        if name == "pre":
+            code = "".join(node.itertext()).rstrip("\n")
+            if code.strip():
+                bufs[-1].append(f"```\n{code}\n```\n\n")
+            continue
+
+        # table (minimal: TSV lines)
+        if name == "table":
+            rows = []
+            for tr in node.iterdescendants("tr"):
+                cells = [_text(c) for c in tr.iterdescendants("th", "td")]
+                if any(cells):
+                    rows.append("\t".join(cells))
+            if rows:
+                bufs[-1].append("\n".join(rows) + "\n\n")
+            continue
+
+        if name == "hr":
+            bufs[-1].append("\n---\n\n")
+            continue
+
+        # default: recurse
+        _push_children(stack, node, level)
+        if node.text:
+            bufs[-1].append(node.text)
+
+
+def _write_collapsed(f, md: str, start: int, end: int) -> None:
+    """Write md[start:end] to f slice by slice, collapsing runs of 3+ newlines to one blank line."""
+    pos = start
+    for m in _BLANKS_RE.finditer(md, start, end):
+        f.write(md[pos:m.start()])
+        f.write("\n\n")
+        pos = m.end()
+    f.write(md[pos:end])
+
+
+def _parse_page(data: bytes) -> etree._Element:
+    """Parse the whole page with lxml; return its root element."""
     try:
-        soup = BeautifulSoup(html, "lxml")
-    except Exception:
-        soup = BeautifulSoup(html, "html.parser")
+        return lxml.html.document_fromstring(data, parser=_HTML_PARSER)
+    except etree.ParserError:
+        # empty document
+        return lxml.html.Element("html")
+
 
+def _locate_lxml(root) -> tuple[str, etree._Element]:
+    """Return (title, main content element) of a parsed page."""
     # Title (WeChat common)
-    title_tag = soup.select_one("#activity-name") or soup.select_one(".rich_media_title") or soup.find("title")
-    title = title_tag.get_text(" ", strip=True) if title_tag else ""
+    title_tag = root.get_element_by_id("activity-name", None)
+    if title_tag is None:
+        title_tag = next(iter(_TITLE_CLASS_XPATH(root)), None)
+    if title_tag is None:
+        title_tag = root.find(".//title")
+    title = _text(title_tag) if title_tag is not None else ""
 
     # Main content (WeChat common)
-    content = (
-        soup.select_one("#js_content")
-        or soup.select_one("div.rich_media_content")
-        or soup.select_one("#img-content")
-        or soup.body
-        or soup
-    )
-
-    # Remove comments
-    for c in content.find_all(string=lambda s: isinstance(s, Comment)):
-        c.extract()
+    content = root.get_element_by_id("js_content", None)
+    if content is None:
+        content = next(iter(_CONTENT_CLASS_XPATH(root)), None)
+    if content is None:
+        content = root.get_element_by_id("img-content", None)
+    if content is None:
+        content = root.find("body")
+    if content is None:
+        content = root
+    return title, content
+
+
+def _empty_noisy(node) -> None:
+    """
+    Empty the noisy descendants of node, keeping the text that follows them. The element
+    itself stays, so the text on either side remains separate pieces for _text.
+    """
+    for el in list(node.iterdescendants(*_NOISY_TAGS)):
+        el.clear(keep_tail=True)
 
-    # Remove noisy tags (and images)
-    for tag in content.find_all(
-        ["script", "style", "noscript", "iframe", "form", "input", "button", "textarea", "select", "option",
-         "img", "figure", "video", "audio", "source", "canvas", "svg"]
-    ):
-        tag.decompose()
 
-    # Unwrap links: keep only visible text, drop href
-    for a in content.find_all("a"):
-        a.replace_with(a.get_text(" ", strip=True))
+def _clean_content(node) -> None:
+    """
+    Prepare a subtree for _to_md: drop noisy tags, strip attributes, squash blank text
+    nodes outside <pre>, and reduce links to their visible text.
+    """
+    # Strip all attributes for cleanliness/privacy (keeps structure). Blank text is squashed
+    # first, while the tags removed below still separate it from its neighbours
+    links = []
+    in_pre = 0
+    for event, el in etree.iterwalk(node, events=("start", "end")):
+        if event == "start":
+            el.attrib.clear()
+            if el.tag == "a" and el is not node:
+                links.append(el)
+            elif el.tag == "pre":
+                in_pre += 1
+            if not in_pre and el.text and el.text.isspace():
+                el.text = _squash_blank(el.text)
+        else:
+            if el.tag == "pre":
+                in_pre -= 1
+            if not in_pre and el.tail and el.tail.isspace() and el is not node:
+                el.tail = _squash_blank(el.tail)
+
+    # Remove noisy tags (and images); comments and processing instructions never made it past the parser
+    _empty_noisy(node)
+
+    # Links: keep only visible text, drop href. The emptied <a> stays in place so its
+    # text remains a separate piece for _text (joined with spaces, not glued to its neighbours)
+    for a in links:
+        text = _text(a)
+        del a[:]
+        a.text = text
+
+
+def _block_md(el, out: list[str]) -> None:
+    """Clean and convert one top-level block of the content (and its tail) for _stream_md."""
+    if el.tag in _NOISY_TAGS:
+        pass
+    elif el.tag == "a":
+        # unwrapped link: its visible text, as _clean_content leaves it
+        _empty_noisy(el)
+        out.append(_text(el))
+    else:
+        _clean_content(el)
+        _to_md(el, out)
+    if el.tail:
+        out.append(_squash_blank(el.tail))
+
+
+def _pull_events(src_path: Path):
+    """Feed the file to a pull parser in chunks, yielding (event, element) as they come."""
+    parser = etree.HTMLPullParser(
+        events=("start", "end"), encoding="utf-8", remove_comments=True, remove_pis=True,
+        huge_tree=True,
+    )
+    parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+    with src_path.open("rb") as f:
+        while True:
+            block = f.read(_STREAM_CHUNK)
+            if not block:
+                break
+            parser.feed(block)
+            yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+def _stream_md(src_path: Path, out: list[str]) -> str | etree._Element | None:
+    """
+    Convert the page while it is parsed: each top-level block of #js_content is cleaned
+    and converted once it (and its tail) is complete, then dropped; everything outside
+    the content is cleared once passed. Only the block being built stays in memory.
+    Appends the Markdown to out and returns the title (same lookup order as
+    _locate_lxml). When there is no container #js_content to stream, nothing is
+    cleared and the root of the parsed page is returned instead, for the caller to
+    convert as a whole; None if the page could not be parsed.
+    """
+    content = None
+    done = False
+    pending = None  # last top-level block, converted when the next starts (its tail is complete)
+    titles = {}  # lookup kind -> first candidate element (document order)
+    title_texts = {}  # lookup kind -> text, once the candidate has ended
+    el = None
+    try:
+        events = _pull_events(src_path)
+        for event, el in events:
+            if event == "start":
+                if content is None:
+                    if el.get("id") == "js_content":
+                        if el.tag not in _CONT:
+                            for _ in events:
+                                pass  # not a container: finish the tree for the caller
+                            break
+                        content = el
+                elif not done and el.getparent() is content:
+                    if pending is None:
+                        if content.text:
+                            out.append(_squash_blank(content.text))
+                    else:
+                        _block_md(pending, out)
+                        content.remove(pending)
+                    pending = el
+
+                # Title (WeChat common)
+                if "id" not in titles and el.get("id") == "activity-name":
+                    titles["id"] = el
+                if "class" not in titles and _TITLE_CLASS_RE.search(el.get("class") or ""):
+                    titles["class"] = el
+                if "tag" not in titles and el.tag == "title":
+                    titles["tag"] = el
+                continue
+
+            for kind, t in titles.items():
+                if t is el and kind not in title_texts:
+                    title_texts[kind] = _text(el)
+
+            if el is content:
+                if pending is None:
+                    if content.text:
+                        out.append(_squash_blank(content.text))
+                else:
+                    _block_md(pending, out)
+                content.clear()
+                done = True
+                if "id" in title_texts:
+                    break  # nothing later can change the result
+            elif done and len(title_texts) == len(titles):
+                # past the content and no title candidate open: free what was parsed
+                el.clear(keep_tail=True)
+                while el.getprevious() is not None:
+                    del el.getparent()[0]
+    except etree.LxmlError:
+        return None
 
-    # Strip all attributes for cleanliness/privacy (keeps structure)
-    for tag in content.find_all(True):
-        tag.attrs = {}
+    if not done:
+        return el.getroottree().getroot() if el is not None else None
+    for kind in ("id", "class", "tag"):
+        if kind in title_texts:
+            return title_texts[kind]
+    return ""
 
-    md = _clean_text(_to_md(content)).strip()
-    md = re.sub(r"\n{3,}", "\n\n", md).strip() + "\n"
 
-    # Prepend title as H1 if not already present
-    if title:
-        first_line = md.splitlines()[0].strip() if md.splitlines() else ""
-        if not (first_line.startswith("# ") and first_line[2:].strip() == title):
-            md = f"# {title}\n\n" + md
+def wechat_html_to_markdown(src_html_path: str, out_md_path: str) -> None:
+    """
+    Convert a downloaded WeChat public-account HTML file into clean, structured Markdown.
+    - No images
+    - Drops link hrefs to avoid tracking parameters
+    - Preserves headings/paragraphs/lists/quotes/code/table (best-effort)
+    """
+    src_path = Path(src_html_path)
+    chunks: list[str] = []
+    streamed = _stream_md(src_path, chunks) if src_path.stat().st_size >= _STREAM_MIN_SIZE else None
+    if isinstance(streamed, str):
+        title = streamed
+    else:
+        # full-tree path: the tree the stream built, or a fresh parse if it failed
+        # (raw bytes: the parser decodes them in C)
+        root = streamed if streamed is not None else _parse_page(src_path.read_bytes())
+        del streamed
+        title, content = _locate_lxml(root)
+        chunks.clear()  # drop any partial output of an abandoned stream
+        _clean_content(content)
+        _to_md(content, chunks)
+
+    md = _clean_text("".join(chunks))
+    del chunks
+
+    # bounds of md.strip(), without copying md
+    start, end = 0, len(md)
+    while start < end and md[start].isspace():
+        start += 1
+    while end > start and md[end - 1].isspace():
+        end -= 1
 
     out_path = Path(out_md_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(md, encoding="utf-8")
+    with out_path.open("w", encoding="utf-8") as f:
+        # Prepend title as H1 if not already present
+        if title:
+            # cut at the first "\n" before splitting: splitlines() also breaks at "\r", U+2028, ...
+            nl = md.find("\n", start, end)
+            lines = md[start:end if nl < 0 else nl].splitlines()
+            first_line = lines[0].strip() if lines else ""
+            if not (first_line.startswith("# ") and first_line[2:].strip() == title):
+                f.write(f"# {title}\n\n")
+        _write_collapsed(f, md, start, end)
+        f.write("\n")
 
 
 if __name__ == "__main__":
@@ -275,6 +607,16 @@ if __name__ == "__main__":
 
     if len(sys.argv) != 3:
         print("Usage: python wechat_clean.py <src.html> <out.md>")
+        print("       python wechat_clean.py <src_dir> <out_dir>")
         raise SystemExit(2)
 
-    wechat_html_to_markdown(sys.argv[1], sys.argv[2])
+    src, out = Path(sys.argv[1]), Path(sys.argv[2])
+    if src.is_dir():
+        # batch: every *.html under src_dir -> same relative path under out_dir (.md), across all cores
+        from multiprocessing import Pool
+
+        jobs = [(str(f), str(out / f.relative_to(src).with_suffix(".md"))) for f in sorted(src.rglob("*.html"))]
+        with Pool() as pool:
+            pool.starmap(wechat_html_to_markdown, jobs)
+    else:
+        wechat_html_to_markdown(sys.argv[1], sys.argv[2])